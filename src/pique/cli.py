@@ -1,12 +1,14 @@
 import argparse
+import glob
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Sequence, Type
+from typing import Any, Callable, Iterator, Optional, Sequence
 
 import polars as pl
 from polars import datatypes
 from rich.text import Text
-from textual import containers, events
+from textual import containers, events, work
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.coordinate import Coordinate
@@ -17,24 +19,28 @@ from textual.widgets import (
     DataTable,
     Static,
 )
+from textual.widgets.data_table import RowKey
 
-from .engine import Engine
+from .engine import Engine, PendingWindow
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DTypeFormat:
     colour: str = "white"
     justify: str = "center"
     overflow: str | None = None
 
 
-DTYPE_STYLE: dict[Type, DTypeFormat] = {
+DTYPE_STYLE: dict[type[pl.DataType] | pl.DataType, DTypeFormat] = {
     datatypes.String: DTypeFormat(colour="green", justify="left", overflow="ellipsis"),
     datatypes.Float64: DTypeFormat(colour="magenta", justify="right"),
     datatypes.Int64: DTypeFormat(colour="blue", justify="right"),
     datatypes.UInt32: DTypeFormat(colour="blue", justify="right"),
 }
 
+_DEFAULT_FMT = DTypeFormat()
+"""Format for dtypes not in DTYPE_STYLE"""
+
 
 class Msg(Static):
     """Msg"""
@@ -65,11 +71,16 @@ class PiqueTable(DataTable):
 
 class ColumnSelector(PiqueTable):
     engine: Engine
-    hidden_columns: list[str]
-    column_stats: pl.DataFrame
+    hidden_columns: set[str]
+    column_stats: pl.DataFrame | None
+    row_for_column: dict[str, int]
 
     _ROW_HEIGHT_OFFSET = -2
 
+    _VISIBLE_NAME_STYLE = "bold white"
+    _VISIBLE_STYLE = "white"
+    _HIDDEN_STYLE = "grey46"
+
     class ColumnVisibilityChanged(Message):
         name: str
         is_hidden: bool
@@ -81,51 +92,55 @@ class ColumnSelector(PiqueTable):
 
     def __init__(self, *args, engine: Engine, **kwargs) -> None:
         self.engine = engine
-        self.column_stats = self.engine.column_stats()
+        self.column_stats = None
 
         super().__init__(*args, **kwargs)
 
-        self.hidden_columns = []
+        self.hidden_columns = set()
+        self.row_for_column = {}
+
+    def visibility_cells(self, col_name: str) -> list[Text]:
+        """The name and is_visible cells, the only cells that change when a column
+        is hidden/shown"""
+        is_hidden = col_name in self.hidden_columns
+
+        name_style = self._HIDDEN_STYLE if is_hidden else self._VISIBLE_NAME_STYLE
+        style = self._HIDDEN_STYLE if is_hidden else self._VISIBLE_STYLE
+
+        name_cell = Text(col_name, style=name_style, justify="left")
+        is_visible_cell = Text("hidden" if is_hidden else "visible", style=style)
+
+        return [name_cell, is_visible_cell]
 
     def render_table(self) -> None:
         self.clear(columns=True)
 
         stats = self.column_stats
+        schema = self.engine.schema
+
+        if stats is None:
+            self.add_column(label="column")
+            self.add_row(Text("Loading column stats…", style="grey46"))
+            return
 
         for col_name in ["column", "is_visible"] + stats.columns[1:]:
             self.add_column(label=col_name)
 
-        def formatted_row(row_idx: int) -> list[Text]:
-            row = stats[row_idx]
-            col_name = row["column_name"].item()
-
-            dtype_format = DTYPE_STYLE.get(self.engine.schema[col_name], DTypeFormat())
-
-            is_hidden = col_name in self.hidden_columns
-
-            bold_style = "bold" if not is_hidden else ""
-            colour_style = "white" if not is_hidden else "grey46"
-            name_style = bold_style + colour_style
+        def formatted_row(row: dict) -> list[Text]:
+            col_name = row["column_name"]
 
-            name_cell = Text(col_name, style=name_style, justify="left")
+            dtype_format = DTYPE_STYLE.get(schema[col_name], _DEFAULT_FMT)
 
-            is_visible_cell = Text(
-                "visible" if col_name not in self.hidden_columns else "hidden",
-                style=colour_style,
-            )
-
-            dtype_cell = Text(
-                row["dtype"].item(), style=dtype_format.colour, justify="center"
-            )
+            dtype_cell = Text(row["dtype"], style=dtype_format.colour, justify="center")
 
             count_cells: list[Text] = [
-                Text(str(row[val_type].item()), justify="right")
+                Text(str(row[val_type]), justify="right")
                 for val_type in ["n_unique", "null_count"]
             ]
 
             min_max_cells: list[Text] = [
                 Text(
-                    row[val_type].item(),
+                    row[val_type],
                     style=dtype_format.colour,
                     justify=dtype_format.justify,
                     overflow="ellipsis",
@@ -134,21 +149,25 @@ class ColumnSelector(PiqueTable):
             ]
 
             return (
-                [name_cell]
-                + [is_visible_cell]
+                self.visibility_cells(col_name)
                 + [dtype_cell]
                 + count_cells
                 + min_max_cells
             )
 
-        for row_idx in range(len(stats)):
-            row = formatted_row(row_idx)
-            self.add_row(*row, height=None)
+        # iter_rows converts each row to a dict in one go, rather than indexing a
+        # one row frame per stat
+        for row_idx, row in enumerate(stats.iter_rows(named=True)):
+            self.add_row(*formatted_row(row), height=None)
+            self.row_for_column[row["column_name"]] = row_idx
 
         self.fixed_columns = 2
         self.cursor_type = "row"
 
     def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        if self.column_stats is None:
+            return
+
         col = str(self.get_cell_at(Coordinate(row=event.cursor_row, column=0)))
 
         self.toggle_hidden(col)
@@ -160,23 +179,41 @@ class ColumnSelector(PiqueTable):
         if is_hidden:
             self.hidden_columns.remove(col_name)
         else:
-            self.hidden_columns.append(col_name)
+            self.hidden_columns.add(col_name)
 
         self.post_message(
             self.ColumnVisibilityChanged(name=col_name, is_hidden=is_hidden)
         )
 
+        # only the toggled column's name/is_visible cells change, so update those
+        # rather than re-rendering the whole table
+        row_idx = self.row_for_column[col_name]
+        for col_idx, cell in enumerate(self.visibility_cells(col_name)):
+            self.update_cell_at(Coordinate(row=row_idx, column=col_idx), cell)
+
+    @work(thread=True, exclusive=True)
+    def load_column_stats(self) -> None:
+        """Calculates the column stats off the UI thread, they need a full pass over
+        the file which would otherwise block startup"""
+        column_stats = self.engine.column_stats()
+        self.app.call_from_thread(self.set_column_stats, column_stats)
+
+    def set_column_stats(self, column_stats: pl.DataFrame) -> None:
+        self.column_stats = column_stats
         self.render_table()
 
     def on_mount(self) -> None:
         self.render_table()
+        self.load_column_stats()
 
 
 class DataViewport(containers.Container):
     engine: Engine
+    _msg: Msg
+    _table: PiqueTable
     rows = reactive(1)
     start_row = reactive(0)
-    hidden_columns: list[str] = reactive([])
+    hidden_columns: reactive[frozenset[str]] = reactive(frozenset())
 
     BINDINGS = [
         Binding("k,up", "cursor_up", "Cursor Up", show=True, priority=True),
@@ -193,59 +230,148 @@ class DataViewport(containers.Container):
     """Subtract from the container size to get number of rows to display,
     accounts for the table header + horizontal scrollbar + displays"""
 
+    _PREFETCH_MARGIN = 3
+    """How close (in rows) the cursor gets to the top/bottom of the page before the
+    pages either side are prefetched"""
+
     def __init__(self, engine: Engine, **kwargs) -> None:
         self.engine = engine
+        self._render_pending = False
+        self._visible_cols = list(engine.columns)
+        self._msg_text = ""
+
+        # what's currently in the table, see render_table_rows
+        self._rendered: tuple[int, int, list[str]] = (0, 0, [])
+        self._row_keys: list[RowKey] = []
+
+        # the schema doesn't change, so each column's formatter is only built once
+        self._formatters = {
+            col: cell_formatter(DTYPE_STYLE.get(dtype, _DEFAULT_FMT), dtype)
+            for col, dtype in engine.schema.items()
+        }
 
         super().__init__(**kwargs)
 
+    def watch_hidden_columns(
+        self, old_hidden: frozenset[str], new_hidden: frozenset[str]
+    ) -> None:
+        self._visible_cols = [
+            col for col in self.engine.columns if col not in new_hidden
+        ]
+
     def watch_rows(self, old_rows: int, new_rows: int) -> None:
-        self.render_table_rows()
+        self._schedule_render()
 
     def watch_start_row(self, old_start_row: int, new_start_row: int) -> None:
         self.log(f"{old_start_row=}, {new_start_row=}")
+        self._schedule_render()
+
+    def _schedule_render(self) -> None:
+        """Render the rows after the next refresh, so changes to several reactives
+        in the same event (e.g. a resize, or a page jump) only render once"""
+        if self._render_pending:
+            return
+
+        self._render_pending = True
+        self.call_after_refresh(self._do_render)
+
+    def _do_render(self) -> None:
+        self._render_pending = False
         self.render_table_rows()
+        self.prefetch_adjacent_pages()
 
     @property
     def table(self) -> PiqueTable:
-        table = self.query_one(PiqueTable)
-        return table
+        return self._table
 
     def compose(self) -> ComposeResult:
-        yield Msg("PENDING")
-        yield PiqueTable(zebra_stripes=True, cell_padding=1)
+        # keep references to the children, rather than querying the DOM for them
+        # on every render and cursor move
+        self._msg = Msg("PENDING")
+        self._table = PiqueTable(zebra_stripes=True, cell_padding=1)
+        yield self._msg
+        yield self._table
 
     @property
     def visible_cols(self) -> list:
-        return [col for col in self.engine.columns if col not in self.hidden_columns]
+        """Columns that aren't hidden, recalculated when hidden_columns changes"""
+        return self._visible_cols
 
     def render_table_columns(self) -> None:
         self.table.clear(columns=True)
         self.table.add_columns(*self.visible_cols)
+        self._row_keys = []
+
+    def formatted_rows(self, df: pl.DataFrame, cols: list[str]) -> Iterator[list[Text]]:
+        formatters = self._formatters
+
+        # convert each column to a python list once, so the per-cell work below is
+        # plain list indexing rather than a trip into polars. Nulls come out as None
+        # for every dtype (empty strings stay "", NaN stays a float), so there's no
+        # need for a separate is_null pass
+        values = [column_values(df[col]) for col in cols]
+        col_formatters = [formatters[col] for col in cols]
+
+        # zip walks the columns in lockstep to give each row's values, rather than
+        # indexing every column list per cell
+        return (
+            [format_cell(value) for format_cell, value in zip(col_formatters, row)]
+            for row in zip(*values)
+        )
 
     def render_table_rows(self) -> None:
         if len(self.table.columns) == 0:
             self.render_table_columns()
 
-        self.table.clear(columns=False)
-
         cols = self.visible_cols
+        start_row, rows = self.start_row, self.rows
+
+        # nothing to show while the viewport has no height, and nothing to do if the
+        # table already holds these rows
+        if rows <= 0 or self.content_size.height <= 0:
+            return
+        if self._row_keys and (start_row, rows, cols) == self._rendered:
+            return
+
+        # scrolling down by less than a page only needs the newly revealed rows, the
+        # ones that scrolled off the top are removed. DataTable can only append rows,
+        # so anything else (scrolling up, resizes, column changes) re-renders the page
+        rendered_start, rendered_rows, rendered_cols = self._rendered
+        scrolled = start_row - rendered_start
+        incremental = (
+            rows == rendered_rows
+            and cols == rendered_cols
+            and 0 < scrolled < len(self._row_keys)
+        )
+
+        if incremental:
+            fetch_start = rendered_start + len(self._row_keys)
+            df = self.engine.view_slice(
+                fetch_start, start_row + rows - fetch_start, columns=cols
+            )
+        else:
+            df = self.engine.view_slice(start_row, rows, columns=cols)
 
-        df = self.engine.view_slice(self.start_row, self.rows)
+        new_rows = self.formatted_rows(df, cols)
 
-        nulls = {col: df.select(pl.col(col).is_null()) for col in cols}
-        styling = {col: DTYPE_STYLE.get(df[col].dtype, DTypeFormat()) for col in cols}
+        # rendering can happen after the cursor was moved (see _schedule_render), so
+        # keep the cursor where it was rather than letting clear() reset it
+        cursor = self.table.cursor_coordinate
 
-        rows = [
-            [
-                format_cell(
-                    df[col][row], fmt=styling[col], is_na=nulls[col].row(row)[0]
-                )
-                for col in cols
-            ]
-            for row in range(len(df))
-        ]
+        # swap the rows out in one batch so the table only repaints once
+        with self.app.batch_update():
+            if incremental:
+                for row_key in self._row_keys[:scrolled]:
+                    self.table.remove_row(row_key)
+                self._row_keys = self._row_keys[scrolled:]
+            else:
+                self.table.clear(columns=False)
+                self._row_keys = []
+
+            self._row_keys += self.table.add_rows(new_rows)
+            self.table.move_cursor(row=cursor.row, column=cursor.column)
 
-        self.table.add_rows(rows)
+        self._rendered = (start_row, rows, cols)
 
     def render_cursor_msg(self) -> None:
         msg = (
@@ -254,7 +380,9 @@ class DataViewport(containers.Container):
             f"NumRows: {self.page_size}; "
             f"DataRows: {self.engine.row_count}; "
         )
-        self.query_one(Msg).update(msg)
+        if msg != self._msg_text:
+            self._msg_text = msg
+            self._msg.update(msg)
 
     def calc_rows_for_viewport_height(self) -> int:
         """Determines number of rows that would fit inside the viewport given a
@@ -270,13 +398,13 @@ class DataViewport(containers.Container):
     @property
     def max_start_row(self) -> int:
         """The maximum start_row, leaves room for a blank row at the bottom to
-        indicate the end of data"""
-        return self.engine.row_count - self.page_size + 1
+        indicate the end of data. 0 when all the rows fit on one page"""
+        return max(self.engine.row_count - self.page_size + 1, 0)
 
     def on_mount(self) -> None:
         self.rows = self.calc_rows_for_viewport_height()
         self.render_table_columns()
-        self.render_table_rows()
+        self._schedule_render()
         self.table.focus()
         self.render_cursor_msg()
 
@@ -289,6 +417,10 @@ class DataViewport(containers.Container):
     def on_resize(self, event: events.Resize) -> None:
         self.rows = self.calc_rows_for_viewport_height()
 
+    def on_show(self, event: events.Show) -> None:
+        # renders are skipped while hidden behind the column selector
+        self._schedule_render()
+
     def action_bottom(self) -> None:
         """Move cursor and viewport to the bottom"""
         cursor_col = self.table.cursor_coordinate.column
@@ -310,6 +442,9 @@ class DataViewport(containers.Container):
 
         self.table.action_cursor_up()
 
+        if self.table.cursor_coordinate.row <= self._PREFETCH_MARGIN:
+            self.prefetch_adjacent_pages()
+
     def action_cursor_down(self) -> None:
         """Move cursor down, if we are at the bottom of the page, move start rown down"""
         max_row_coord = self.page_size - 1
@@ -326,6 +461,9 @@ class DataViewport(containers.Container):
 
         self.table.action_cursor_down()
 
+        if self.table.cursor_coordinate.row >= max_row_coord - self._PREFETCH_MARGIN:
+            self.prefetch_adjacent_pages()
+
     def action_cursor_left(self) -> None:
         self.table.action_cursor_left()
 
@@ -357,13 +495,42 @@ class DataViewport(containers.Container):
         else:
             self.table.action_page_down()
 
+    def prefetch_adjacent_pages(self) -> None:
+        """Reads the pages before and after the viewport into the engine's cache in
+        the background, so scrolling onto them doesn't wait on the file"""
+        page_size = self.page_size
+        cols = self.visible_cols
+
+        start_rows = []
+        if self.start_row > 0:
+            start_rows.append(max(self.start_row - page_size, 0))
+        if self.start_row + page_size < self.engine.row_count:
+            start_rows.append(self.start_row + page_size)
+
+        # skips pages that are cached, or still being read by an earlier prefetch
+        windows = [
+            window
+            for start_row in start_rows
+            if (window := self.engine.start_read(start_row, page_size, cols))
+        ]
+        if windows:
+            self.prefetch_rows(windows)
+
+    @work(thread=True, group="prefetch")
+    def prefetch_rows(self, windows: list[PendingWindow]) -> None:
+        for window in windows:
+            window.read()
+            # the engine's caches are only touched from the main thread
+            self.app.call_from_thread(self.engine.finish_read, window)
+
     def toggle_hidden(self, col_name: str) -> None:
         is_hidden = col_name in self.hidden_columns
 
+        # reassign rather than mutate, so watch_hidden_columns picks up the change
         if is_hidden:
-            self.hidden_columns.remove(col_name)
+            self.hidden_columns = self.hidden_columns - {col_name}
         else:
-            self.hidden_columns.append(col_name)
+            self.hidden_columns = self.hidden_columns | {col_name}
 
         self.render_table_columns()
         self.render_table_rows()
@@ -379,11 +546,10 @@ class Pique(App):
         Binding("d", "debug_log", "debug log"),
     ]
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, filename: Path, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
-        parsed_args = parse_args()
-        self.filename = parsed_args.filename
+        self.filename = filename
         self.engine = Engine(filepath=self.filename)
 
     def action_debug_log(self) -> None:
@@ -419,12 +585,9 @@ class Pique(App):
 
 
 def valid_filepath(s: str) -> Path:
-    try:
-        path = Path(s)
-    except ValueError:
-        raise argparse.ArgumentTypeError(f"invalid filepath {s}")
-
-    if not path.exists():
+    """A file, a directory of files, or a glob matching at least one file"""
+    path = Path(s)
+    if not path.exists() and not glob.glob(s, recursive=True):
         raise argparse.ArgumentTypeError(f"file {path} does not exist")
 
     return path
@@ -433,21 +596,76 @@ def valid_filepath(s: str) -> Path:
 def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("filename", type=valid_filepath, help="path to file")
+    parser.add_argument(
+        "filename",
+        type=valid_filepath,
+        help="path to a file, a directory of (hive partitioned) files, or a glob",
+    )
 
     return parser.parse_args(argv)
 
 
 def cli() -> None:
-    app = Pique()
+    args = parse_args()
+    app = Pique(filename=args.filename)
     app.run()
 
 
-def format_cell(cell, fmt: DTypeFormat, is_na: bool = False) -> Text:
-    if isinstance(cell, str):
-        cell_repr = repr(cell)
-    else:
-        cell_repr = str(cell)
+CellFormatter = Callable[[Any], Text]
+
+_REPR_DTYPES = (datatypes.String, datatypes.Categorical, datatypes.Enum)
+"""dtypes whose values are python strings, shown quoted"""
+
+MAX_CELL_CHARS = 200
+"""Longer strings are cut to this many characters, plus an ellipsis, before being
+formatted"""
+
+
+def column_values(series: pl.Series) -> list:
+    """A column's values as a python list. Integer and date columns are stringified
+    by polars in one vectorised cast (it formats them the same as str()), so the
+    str() in their cell formatter is a no-op. Strings are truncated by polars, so
+    long text isn't copied into python only to be cut off by the table"""
+    if series.dtype.is_integer() or series.dtype == datatypes.Date:
+        series = series.cast(pl.String)
+    elif series.dtype == datatypes.String:
+        # cut off strings end with an ellipsis, so they aren't mistaken for the
+        # whole value
+        col = pl.col(series.name)
+        series = (
+            series.to_frame()
+            .select(
+                pl.when(col.str.len_chars() > MAX_CELL_CHARS)
+                .then(col.str.slice(0, MAX_CELL_CHARS) + "…")
+                .otherwise(col)
+            )
+            .to_series()
+        )
+
+    return series.to_list()
+
+
+def cell_formatter(fmt: DTypeFormat, dtype: pl.DataType) -> CellFormatter:
+    """Builds the formatter for the cells of one column. Picking repr/str and
+    reading the style happens once per column rather than once per cell"""
+    colour, overflow, justify = fmt.colour, fmt.overflow, fmt.justify
+    to_str = repr if dtype in _REPR_DTYPES else str
+
+    # every null in the column renders the same, so they all share one Text
+    null_text = _make_text("None", "gray", overflow, justify)
+
+    def _format_cell(cell: Any) -> Text:
+        if cell is None:
+            return null_text
+
+        return _make_text(to_str(cell), colour, overflow, justify)
+
+    return _format_cell
+
 
-    colour = fmt.colour if not is_na else "gray"
-    return Text(cell_repr, style=colour, overflow=fmt.overflow, justify=fmt.justify)
+@lru_cache(maxsize=4096)
+def _make_text(cell_repr: str, colour: str, overflow: str | None, justify: str) -> Text:
+    """Cached Text construction, cells with the same value and style (booleans,
+    categories, nulls) share a single Text. DataTable doesn't mutate the Text it
+    renders, so sharing is safe"""
+    return Text(cell_repr, style=colour, overflow=overflow, justify=justify)
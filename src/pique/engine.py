@@ -1,17 +1,43 @@
 """Underlying engine for handling/filtering data"""
 
-from functools import reduce
+from concurrent.futures import Future
+from functools import partial
 from logging import getLogger
 from pathlib import Path
-from typing import Callable, OrderedDict
+from types import MappingProxyType
+from typing import IO, Any, Callable, Mapping
 
 import polars as pl
 
-Reader = Callable[[Path], pl.LazyFrame]
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+Source = Path | IO[bytes]
+"""A path, or an in-memory buffer holding a file's bytes"""
+
+Reader = Callable[[Source], pl.LazyFrame]
 
 
 _DEFAULT_CACHED_ROWS = 300
 
+_MAX_CACHED_WINDOWS = 8
+"""How many cached windows a lazily read file keeps, least recently used go first"""
+
+_PARQUET_EXTENSIONS = (".pqt", ".parquet")
+
+_EAGER_LOAD_MAX_BYTES = 512 * 1024**2
+"""Parquet files up to this size are read into memory up front"""
+
+_EAGER_CSV_MAX_BYTES = 64 * 1024**2
+"""CSV files up to this size are read into memory up front. Lower than for parquet,
+as csv is slower to parse and takes more space on disk than in memory"""
+
+_STREAMING_MIN_ROWS = 1_000_000
+"""Cache windows of at least this many rows are collected with the streaming engine,
+which doesn't need to hold the whole scan in memory at once"""
+
 log = getLogger(__name__)
 
 
@@ -19,171 +45,592 @@ class CachedData:
     lazy_frame: pl.LazyFrame
     num_cached_rows: int
     cached_row_start: int
+    columns: list[str] | None
     data: pl.DataFrame
 
     def __init__(
-        self, lazy_frame: pl.LazyFrame, num_cached_rows: int, cached_row_start: int = 0
+        self,
+        lazy_frame: pl.LazyFrame,
+        num_cached_rows: int,
+        cached_row_start: int = 0,
+        columns: list[str] | None = None,
     ):
         self.lazy_frame = lazy_frame
         self.num_cached_rows = num_cached_rows
         self.cached_row_start = cached_row_start
+        self.columns = columns
         self.update_cache()
 
     @property
     def cached_row_end(self) -> int:
         return self.cached_row_start + self.num_cached_rows
 
-    def is_row_in_cache(self, row_idx: int) -> bool:
-        return (row_idx >= self.cached_row_start) and (row_idx <= self.cached_row_end)
-
     def is_slice_in_cache(self, offset: int, length: int) -> bool:
-        start_in_cache = self.is_row_in_cache(offset)
-
-        end_in_cache = self.is_row_in_cache(offset + length)
-        return start_in_cache and end_in_cache
+        # the slice covers rows offset..offset + length - 1
+        relative_offset = offset - self.cached_row_start
+        return 0 <= relative_offset and relative_offset + length <= self.num_cached_rows
 
-    def cache_start_for_row(self, row: int) -> int:
-        """Calculates the best cache_start to center the cache around a row"""
-        return max(row - (self.num_cached_rows // 2), 0)
+    def has_columns(self, columns: list[str]) -> bool:
+        return set(columns).issubset(self.data.columns)
 
-    def update_cache(
-        self, cached_row_start: int | None = None, num_cached_rows: int | None = None
-    ) -> None:
-        self.cached_row_start = cached_row_start or self.cached_row_start
-        self.num_cached_rows = num_cached_rows or self.num_cached_rows
+    def is_cached(self, offset: int, length: int, columns: list[str] | None) -> bool:
+        """Whether a slice can be served without reading the file"""
+        columns_cached = columns is None or self.has_columns(columns)
+        return columns_cached and self.is_slice_in_cache(offset=offset, length=length)
 
+    def update_cache(self) -> None:
         log.info(f"UPDATE CACHE: {self.cached_row_start=}, {self.num_cached_rows=}")
-        self.data = self.lazy_frame.slice(
+
+        # select before slicing so polars pushes the projection down into the scan
+        lazy_frame = self.lazy_frame
+        if self.columns is not None:
+            lazy_frame = lazy_frame.select(self.columns)
+
+        self.data = lazy_frame.slice(
             offset=self.cached_row_start, length=self.num_cached_rows
-        ).collect()
+        ).collect(
+            engine="streaming"
+            if self.num_cached_rows >= _STREAMING_MIN_ROWS
+            else "in-memory"
+        )
 
     def cache_relative_offset(self, offset: int) -> int:
         """Calculates a cache-relative offset from a frame-relative offset"""
+        # an empty slice can start just past the last cached row
+        assert self.cached_row_start <= offset <= self.cached_row_end, (
+            f"{offset=} is outside the cache"
+        )
         return offset - self.cached_row_start
 
-    def view_slice(self, offset: int, length: int) -> pl.DataFrame:
-        log.info(f"VIEW_SLICE {offset=}, {length=}")
-        if not self.is_slice_in_cache(offset=offset, length=length):
-            log.warn(
-                f"CACHE MISS: {offset=}, {length=}, {self.cached_row_start=}, {self.num_cached_rows=}"
-            )
-            # cache miss - ensure we cache at least the lenght of the requested slice
-            self.num_cached_rows = max(self.num_cached_rows, length * 2)
-            self.update_cache(
-                cached_row_start=self.cache_start_for_row(offset),
-            )
+    def view_slice(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> pl.DataFrame:
+        log.info(f"VIEW_SLICE {offset=}, {length=}, {columns=}")
+        # windows are shared through the engine's LRU, so are never refilled in
+        # place. Engine.find_cache only hands out windows that hold the slice
+        assert self.is_cached(offset, length, columns), (
+            f"{offset=}, {length=}, {columns=} is outside the cache"
+        )
 
         log.info(
             f"CACHE HIT: {offset=}, {length=}, {self.cached_row_start=}, {self.num_cached_rows=}"
         )
         log.info(f"RELATIVE_OFFSET: {self.cache_relative_offset(offset)=}")
-        return self.data.slice(offset=self.cache_relative_offset(offset), length=length)
+        data = self.data.slice(offset=self.cache_relative_offset(offset), length=length)
+
+        return data if columns is None else data.select(columns)
+
+
+class PendingWindow:
+    """A cache window a worker thread has been asked to read. Tracked by the engine
+    so the same rows aren't read twice, and a cache miss can wait on the read"""
+
+    lazy_frame: pl.LazyFrame
+    num_cached_rows: int
+    cached_row_start: int
+    columns: list[str] | None
+    future: "Future[CachedData]"
+
+    def __init__(
+        self,
+        lazy_frame: pl.LazyFrame,
+        num_cached_rows: int,
+        cached_row_start: int = 0,
+        columns: list[str] | None = None,
+    ):
+        self.lazy_frame = lazy_frame
+        self.num_cached_rows = num_cached_rows
+        self.cached_row_start = cached_row_start
+        self.columns = columns
+        self.future = Future()
+
+    def is_cached(self, offset: int, length: int, columns: list[str] | None) -> bool:
+        """Whether the window will hold a slice once read"""
+        columns_cached = (
+            columns is None
+            if self.columns is None
+            else columns is not None and set(columns).issubset(self.columns)
+        )
+        relative_offset = offset - self.cached_row_start
+        return (
+            columns_cached
+            and 0 <= relative_offset
+            and relative_offset + length <= self.num_cached_rows
+        )
+
+    def read(self) -> None:
+        """Reads the window, run on a worker thread. Skipped if the read was
+        cancelled before it started"""
+        if not self.future.set_running_or_notify_cancel():
+            return
+
+        try:
+            cache = CachedData(
+                lazy_frame=self.lazy_frame,
+                num_cached_rows=self.num_cached_rows,
+                cached_row_start=self.cached_row_start,
+                columns=self.columns,
+            )
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(cache)
 
 
 class Engine:
-    filepath: Path
+    filepath: Source
     reader: Reader
     num_cached_rows: int
     frame: pl.LazyFrame
-    cache: CachedData
-    schema: OrderedDict
+    data: pl.DataFrame | None
+    filter: pl.Expr | None
+    filtered_frame: pl.LazyFrame
+    filtered_data: pl.DataFrame | None
+    caches: list[CachedData]
+    pending: list[PendingWindow]
+    schema: pl.Schema
     columns: list
     row_count: int
+    parquet_metadata: Any
 
     def __init__(
         self,
-        filepath: Path | str,
+        filepath: Source | str,
         reader: Reader | None = None,
         num_cached_rows: int = _DEFAULT_CACHED_ROWS,
+        eager: bool | None = None,
+        format: str | None = None,
     ):
         if isinstance(filepath, str):
             filepath = Path(filepath)
 
         if reader is None:
-            reader = auto_reader
+            reader = (
+                auto_reader if format is None else partial(auto_reader, format=format)
+            )
 
         frame = reader(filepath)
 
         self.filepath = filepath
         self.reader = reader
         self.frame = frame
-        self.schema = frame.schema
-        self.columns = frame.columns
-        self.dtypes = frame.dtypes
-        self.row_count = lazy_row_count(frame)
-        self.num_cached_rows = min(num_cached_rows, self.row_count)
-        self.cache = CachedData(lazy_frame=frame, num_cached_rows=self.num_cached_rows)
+        # resolve the schema once, columns/dtypes are derived from it rather than
+        # asking the LazyFrame (which resolves the schema again) each time
+        self.schema = frame.collect_schema()
+        self.columns = self.schema.names()
+        self.dtypes = self.schema.dtypes()
+        # the footer describes the whole file, a custom reader might filter rows or
+        # derive columns, so its row count and statistics can't be trusted
+        self.parquet_metadata = (
+            read_parquet_metadata(filepath)
+            if reader in (auto_reader, lazy_read_parquet)
+            else None
+        )
+
+        # eager reads the whole file into memory up front, so slicing never goes back
+        # to the file. By default only done for in-memory buffers, and files that
+        # comfortably fit
+        if eager is None:
+            eager = not isinstance(filepath, Path) or fits_in_memory(filepath)
+
+        if eager:
+            self.data = frame.collect()
+            self.row_count = len(self.data)
+            self.num_cached_rows = self.row_count
+            self.caches = []
+        else:
+            self.data = None
+            # parquet footers record the row count, so there's no need to scan the file
+            if self.parquet_metadata is not None:
+                self.row_count = self.parquet_metadata.num_rows
+            else:
+                self.row_count = lazy_row_count(frame)
+            self.num_cached_rows = min(num_cached_rows, self.row_count)
+            self.caches = [
+                CachedData(lazy_frame=frame, num_cached_rows=self.num_cached_rows)
+            ]
+
+        self.pending = []
+        self.filter = None
+        self.filtered_frame = frame
+        self.filtered_data = self.data
+
+    def apply_filter(self, expr: pl.Expr | None) -> None:
+        """Only view rows matching a filter, None views every row again. For lazily
+        read files the filter goes into the scan, so polars can skip parquet row
+        groups that can't match"""
+        self.filter = expr
+
+        if self.data is not None:
+            self.filtered_data = self.data if expr is None else self.data.filter(expr)
+            self.row_count = len(self.filtered_data)
+            return
+
+        self.filtered_frame = self.frame if expr is None else self.frame.filter(expr)
+        self.row_count = lazy_row_count(self.filtered_frame)
+        # windows of the previous frame hold the wrong rows
+        for window in self.pending:
+            window.future.cancel()
+        self.pending = []
+        self.caches = [
+            CachedData(
+                lazy_frame=self.filtered_frame,
+                num_cached_rows=min(self.num_cached_rows, self.row_count),
+            )
+        ]
+
+    def view_slice(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> pl.DataFrame:
+        """A slice of rows, optionally only reading the given columns"""
+        # a negative offset would make polars slice from the end of the frame
+        offset = min(max(offset, 0), self.row_count)
+
+        if self.filtered_data is not None:
+            data = self.filtered_data
+            if columns is not None:
+                data = data.select(columns)
+            return data.slice(offset=offset, length=length)
+
+        # past the end of the frame there is nothing to cache
+        length = max(min(length, self.row_count - offset), 0)
+        cache = self.find_cache(offset, length, columns) or self.wait_for_pending(
+            offset, length, columns
+        )
+        if cache is None:
+            log.warning(f"CACHE MISS: {offset=}, {length=}")
+            cache = self.read_window(offset, length, columns)
+
+        self.add_cache(cache)
+        return cache.view_slice(offset, length, columns=columns)
+
+    def is_cached(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> bool:
+        """Whether view_slice can serve a slice without reading the file"""
+        if self.data is not None:
+            return True
+
+        offset = min(max(offset, 0), self.row_count)
+        length = max(min(length, self.row_count - offset), 0)
+        return self.find_cache(offset, length, columns) is not None
+
+    def find_cache(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> CachedData | None:
+        """The most recently used cached window holding a slice, if any"""
+        for cache in self.caches:
+            if cache.is_cached(offset, length, columns):
+                return cache
+        return None
+
+    def find_pending(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> PendingWindow | None:
+        """A window being read by a worker thread that will hold a slice, if any"""
+        for window in self.pending:
+            if window.is_cached(offset, length, columns):
+                return window
+        return None
+
+    def wait_for_pending(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> CachedData | None:
+        """Waits for a worker thread already reading a slice's window. A read that
+        hasn't started yet is cancelled instead, as reading it here is as quick"""
+        window = self.find_pending(offset, length, columns)
+        if window is None:
+            return None
+
+        self.pending.remove(window)
+        if window.future.cancel():
+            return None
+
+        log.info(f"WAITING ON PENDING: {offset=}, {length=}")
+        try:
+            return window.future.result()
+        except Exception:
+            log.exception("pending read failed")
+            return None
+
+    def start_read(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> PendingWindow | None:
+        """Marks the cache window around a slice as being read, for a worker thread to
+        call PendingWindow.read then hand back to finish_read. None if the slice is
+        already cached or being read. Only call from the main thread"""
+        offset = min(max(offset, 0), self.row_count)
+        length = max(min(length, self.row_count - offset), 0)
+        if self.is_cached(offset, length, columns) or self.find_pending(
+            offset, length, columns
+        ):
+            return None
+
+        cached_row_start, num_cached_rows = window_for_slice(
+            offset, length, self.num_cached_rows
+        )
+        window = PendingWindow(
+            lazy_frame=self.filtered_frame,
+            num_cached_rows=num_cached_rows,
+            cached_row_start=cached_row_start,
+            columns=columns,
+        )
+        self.pending.append(window)
+        return window
+
+    def finish_read(self, window: PendingWindow) -> None:
+        """Caches a window read by a worker thread, unless a cache miss already took
+        it or the filter changed since it was started"""
+        if window not in self.pending:
+            return
+
+        self.pending.remove(window)
+        if window.future.exception() is None:
+            self.add_cache(window.future.result())
+
+    def add_cache(self, cache: CachedData) -> None:
+        """Marks a cached window as the most recently used, dropping the least
+        recently used windows once there are more than _MAX_CACHED_WINDOWS"""
+        if cache.lazy_frame is not self.filtered_frame:
+            # read before the filter changed, e.g. by a prefetch
+            return
+
+        if cache in self.caches:
+            self.caches.remove(cache)
+        self.caches.insert(0, cache)
+        del self.caches[_MAX_CACHED_WINDOWS:]
+
+    def read_window(
+        self, offset: int, length: int, columns: list[str] | None = None
+    ) -> CachedData:
+        """Reads the cache window around a slice into a new CachedData. Doesn't touch
+        the existing caches, so it is safe to call from a worker thread and hand the
+        result to add_cache on the main thread"""
+        cached_row_start, num_cached_rows = window_for_slice(
+            offset, length, self.num_cached_rows
+        )
 
-    def view_slice(self, offset: int, length: int) -> pl.DataFrame:
-        return self.cache.view_slice(offset, length)
+        return CachedData(
+            lazy_frame=self.filtered_frame,
+            num_cached_rows=num_cached_rows,
+            cached_row_start=cached_row_start,
+            columns=columns,
+        )
 
     def column_stats(self) -> pl.DataFrame:
         """per-column statistics (number of unique values, nulls, etc)"""
 
-        lf = self.frame
-
-        def _transpose_result(
-            frame: pl.LazyFrame | pl.DataFrame, result_name: str
-        ) -> pl.DataFrame:
-            if isinstance(frame, pl.LazyFrame):
-                frame = frame.collect()
+        # statistics of the rows being viewed, i.e. after any filter
+        lf = (
+            self.filtered_frame
+            if self.filtered_data is None
+            else self.filtered_data.lazy()
+        )
 
-            return frame.transpose(
-                include_header=True,
-                header_name="column_name",
-                column_names=[result_name],
+        footer_stats = {}
+        # the footer describes every row in the file, not just those passing a filter
+        if self.parquet_metadata is not None and self.filter is None:
+            footer_stats = parquet_footer_stats(self.parquet_metadata)
+            footer_stats = {
+                k: v
+                for k, v in footer_stats.items()
+                if k in self.schema and footer_stats_match_scan(self.schema[k])
+            }
+
+        # n_unique always needs a scan, the rest only for columns without footer
+        # statistics. All aggregations go in one select so the file is only
+        # scanned once
+        scanned = [col for col in self.columns if col not in footer_stats]
+        stats = (
+            lf.select(
+                pl.all().n_unique().name.suffix("__n_unique"),
+                pl.col(scanned).null_count().name.suffix("__null_count"),
+                pl.col(scanned).min().name.suffix("__min_value"),
+                pl.col(scanned).max().name.suffix("__max_value"),
             )
+            .collect()
+            .row(0, named=True)
+        )
 
-        dtypes = pl.DataFrame(
-            {str(name): str(dtype) for name, dtype in lf.schema.items()}
-        ).pipe(_transpose_result, result_name="dtype")
+        for col, col_stats in footer_stats.items():
+            for stat, value in col_stats.items():
+                stats[f"{col}__{stat}"] = value
+
+        return stats_frame(self.schema, stats)
+
+
+def fits_in_memory(path: Path) -> bool:
+    """Whether a file is small enough to read into memory up front. Directories and
+    globs of files never are"""
+    if not path.is_file():
+        return False
+
+    suffix, size = path.suffix.lower(), path.stat().st_size
+    if suffix in _PARQUET_EXTENSIONS:
+        return size <= _EAGER_LOAD_MAX_BYTES
+    if suffix == ".csv":
+        return size <= _EAGER_CSV_MAX_BYTES
+    return False
+
+
+def window_for_slice(offset: int, length: int, num_cached_rows: int) -> tuple[int, int]:
+    """(cached_row_start, num_cached_rows) for a window with at least a page either
+    side of a slice, so scrolling back and forth around it is served from memory"""
+    num_cached_rows = max(num_cached_rows, length * 3)
+    cached_row_start = max(offset + length // 2 - num_cached_rows // 2, 0)
+    return cached_row_start, num_cached_rows
+
+
+def stats_frame(schema: pl.Schema, stats: dict) -> pl.DataFrame:
+    """Reshapes a single row of suffixed aggregations (`<column>__<stat>`) into
+    one row per column"""
+
+    def _as_str(value) -> str | None:
+        return None if value is None else str(value)
+
+    columns = [str(name) for name in schema]
+
+    return pl.DataFrame(
+        {
+            "column_name": columns,
+            "dtype": [str(dtype) for dtype in schema.values()],
+            "n_unique": [stats[f"{col}__n_unique"] for col in columns],
+            "null_count": [stats[f"{col}__null_count"] for col in columns],
+            "min_value": [_as_str(stats[f"{col}__min_value"]) for col in columns],
+            "max_value": [_as_str(stats[f"{col}__max_value"]) for col in columns],
+        },
+        schema={
+            "column_name": pl.String,
+            "dtype": pl.String,
+            "n_unique": pl.UInt32,
+            "null_count": pl.UInt32,
+            "min_value": pl.String,
+            "max_value": pl.String,
+        },
+    )
+
+
+def read_parquet_metadata(path: Source) -> Any:
+    """Footer metadata of a parquet file, None for other files, buffers or when
+    pyarrow isn't installed"""
+    if (
+        pq is None
+        or not isinstance(path, Path)
+        or path.suffix.lower() not in _PARQUET_EXTENSIONS
+        or not path.is_file()
+    ):
+        return None
 
-        n_unique = lf.select(pl.all().n_unique()).pipe(
-            _transpose_result, result_name="n_unique"
-        )
-        null_count = lf.select(pl.all().null_count()).pipe(
-            _transpose_result, result_name="null_count"
-        )
-        min_value = lf.select(pl.all().min()).pipe(
-            _transpose_result, result_name="min_value"
-        )
-        max_value = lf.select(pl.all().max()).pipe(
-            _transpose_result, result_name="max_value"
-        )
+    return pq.ParquetFile(path).metadata
+
+
+def footer_stats_match_scan(dtype: pl.DataType) -> bool:
+    """Whether parquet footer min/max values for a dtype are what a polars scan
+    returns. They aren't for floats (NaN handling), durations (raw integers),
+    categoricals (dictionary order) and others, which are scanned instead"""
+    return dtype.is_integer() or dtype in (pl.String, pl.Date, pl.Datetime, pl.Boolean)
 
-        result = reduce(
-            lambda x, y: x.join(
-                y, on="column_name", how="outer_coalesce", validate="1:1"
-            ),
-            [dtypes, n_unique, null_count, min_value, max_value],
-        )
 
-        return result
+def parquet_footer_stats(metadata: Any) -> dict[str, dict[str, Any]]:
+    """min/max/null_count per column, aggregated across the row group statistics
+    in a parquet footer. Columns missing statistics in any row group are left out"""
+    stats: dict[str, dict[str, Any]] = {}
+    incomplete: set[str] = set()
 
+    for rg_idx in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg_idx)
 
-def lazy_read_csv(path: Path) -> pl.LazyFrame:
+        for col_idx in range(row_group.num_columns):
+            chunk = row_group.column(col_idx)
+            name = chunk.path_in_schema
+
+            if name in incomplete:
+                continue
+
+            chunk_stats = chunk.statistics
+            if (
+                chunk_stats is None
+                or not chunk_stats.has_min_max
+                or not chunk_stats.has_null_count
+            ):
+                incomplete.add(name)
+                stats.pop(name, None)
+                continue
+
+            col_stats = stats.get(name)
+            if col_stats is None:
+                stats[name] = {
+                    "null_count": chunk_stats.null_count,
+                    "min_value": chunk_stats.min,
+                    "max_value": chunk_stats.max,
+                }
+            else:
+                col_stats["null_count"] += chunk_stats.null_count
+                col_stats["min_value"] = min(col_stats["min_value"], chunk_stats.min)
+                col_stats["max_value"] = max(col_stats["max_value"], chunk_stats.max)
+
+    return stats
+
+
+def lazy_read_csv(path: Source) -> pl.LazyFrame:
     return pl.scan_csv(path, try_parse_dates=True)
 
 
-def lazy_read_parquet(path: Path) -> pl.LazyFrame:
-    return pl.scan_parquet(path)
+def lazy_read_parquet(path: Source) -> pl.LazyFrame:
+    # filters on the frame are evaluated first, so only the rows that pass are
+    # decoded for the remaining columns
+    return pl.scan_parquet(path, parallel="prefiltered")
 
 
-def auto_reader(path: Path) -> pl.LazyFrame:
-    READERS: dict[str, Reader] = {
+_READERS: Mapping[str, Reader] = MappingProxyType(
+    {
         ".csv": lazy_read_csv,
         ".pqt": lazy_read_parquet,
         ".parquet": lazy_read_parquet,
     }
-
-    extension = path.suffix.lower()
+)
+"""Reader for each supported file extension"""
+
+
+def lazy_read_dataset(path: Path) -> pl.LazyFrame:
+    """Reads every parquet file (or if there are none, every csv file) under a
+    directory as one frame. Hive style partition directories (e.g. year=2024/)
+    become columns, and filters on them skip whole files"""
+    parquet_globs = [
+        path / "**" / f"*{extension}"
+        for extension in _PARQUET_EXTENSIONS
+        if next(path.rglob(f"*{extension}"), None) is not None
+    ]
+    if parquet_globs:
+        # not parallel="prefiltered" like lazy_read_parquet, polars can panic when
+        # prefiltering on a hive partition column, as it isn't stored in the files
+        return pl.scan_parquet(parquet_globs, hive_partitioning=True)
+    if next(path.rglob("*.csv"), None) is not None:
+        return pl.scan_csv(path / "**" / "*.csv", try_parse_dates=True)
+
+    raise ValueError(f"No parquet or csv files found in {path}")
+
+
+def auto_reader(path: Source, format: str | None = None) -> pl.LazyFrame:
+    """Reads a file with the reader for its extension, or for the given format (e.g.
+    "csv"), which in-memory buffers need as they have no extension"""
+    if format is not None:
+        extension = f".{format.lower()}"
+    elif not isinstance(path, Path):
+        raise ValueError("The format is needed to read an in-memory buffer")
+    elif path.is_dir():
+        return lazy_read_dataset(path)
+    else:
+        # globs (e.g. data/*.parquet) go to the reader for their extension, polars
+        # expands them to every matching file
+        extension = path.suffix.lower()
 
     try:
-        return READERS[extension](path)
+        return _READERS[extension](path)
     except KeyError:
         raise ValueError(f"The file extension {extension} is not supported")
 
 
 def lazy_row_count(lf: pl.LazyFrame) -> int:
     """Get the row count of a LazyFrame"""
-    return lf.select(pl.count()).collect().item()
+    return lf.select(pl.len()).collect().item()